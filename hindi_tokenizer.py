@@ -1,19 +1,37 @@
 import re
+import heapq
+import mmap
+import tempfile
+from array import array
 from collections import defaultdict, Counter
-from typing import List, Dict, Tuple
+from itertools import accumulate, chain, islice, repeat
+from typing import List, Dict, Tuple, Union
 from tabulate import tabulate
 
+# Text cleaning patterns, compiled once rather than on every re.sub call
+_RE_PUNCT = re.compile(r'[!@#$%^&*(),.?":{}|<>\u0964\u0965]')
+_RE_NON_HINDI = re.compile(r'[^\u0900-\u097F\sA-Za-z0-9]')
+# English words and numbers are matched as whole whitespace-separated runs,
+# so a run becomes a single <eng> or <num> without a separate collapse pass
+_RE_ENG = re.compile(r'[A-Za-z]+(?:\s+[A-Za-z]+)*')
+_RE_NUM = re.compile(r'[०-९0-9]+(?:\s+[०-९0-9]+)*')
+# Whitespace runs that are not already a single space; most separators are
+# one ' ', and matching those too would replace each one with itself
+_RE_SPACE = re.compile(r' \s+|[^\S ]\s*')
+
 class HindiTokenizer:
     """
     A tokenizer for Hindi text that uses Byte-Pair Encoding (BPE) on UTF-8 encoded tokens.
     Implements a vocabulary-based compression algorithm that iteratively merges the most
     frequent pairs of UTF-8 codes into new tokens.
     """
-    def __init__(self, file_path: str):
+    def __init__(self, file_path: str, verbose: bool = False):
         # Basic configuration
         self.file_path = file_path
+        self.verbose = verbose  # Decode an example word for every merge, not every 100th
         self.initial_vocab_size = 0
         self.initial_tokens_length = 0  # Will be set in build_vocabulary
+        self.total_tokens = 0  # Kept up to date by build_vocabulary
         self.vocab_size = 50000
         self.special_tokens = ['<pad>', '<eos>', '<bos>', '<unk>', '<num>', '<eng>']
         self.token_to_id = {}
@@ -25,11 +43,17 @@ class HindiTokenizer:
             self.text = self.load_and_clean_text()
             self.vocab = set()
             
-            # Step 3: Initialize vocabulary with special tokens and characters
-            self.initialize_vocab()
+            # Step 3: Convert unique words to UTF-8 encodings for BPE
+            self.word_freq = self.convert_to_utf8()
             
-            # Step 4: Convert text to UTF-8 encodings for BPE
-            self.encoded_tokens = self.convert_to_utf8()
+            # Training only needs word_freq, so release the text before BPE
+            # (an empty corpus comes back as b'', which has nothing to close)
+            if self.text:
+                self.text.close()
+            del self.text
+            
+            # Step 4: Initialize vocabulary with special tokens and characters
+            self.initialize_vocab()
             
             # Store initial vocab size
             self.initial_vocab_size = len(self.vocab)
@@ -43,67 +67,110 @@ class HindiTokenizer:
         except FileNotFoundError:
             raise FileNotFoundError(f"Could not find file: {file_path}")
     
-    def load_and_clean_text(self) -> str:
+    def load_and_clean_text(self) -> Union[mmap.mmap, bytes]:
         """
         Load text file and clean it by:
         - Replacing numbers with <num> token
         - Replacing English words with <eng> token
         - Removing punctuation and special characters
         - Keeping only Hindi characters and spaces
+        
+        The file is streamed in chunks cut at whitespace, and each cleaned
+        chunk is written to a temporary file, so neither the raw nor the
+        cleaned corpus is ever held in memory. Returns a read-only memory
+        map of the cleaned UTF-8 text (words separated by single spaces),
+        or b'' if nothing is left after cleaning.
         """
         # Read large files in chunks to manage memory
         chunk_size = 1024 * 1024  # 1MB chunks
-        text = ""
         
-        with open(self.file_path, 'r', encoding='utf-8') as file:
-            while True:
-                chunk = file.read(chunk_size)
-                if not chunk:
-                    break
-                text += chunk
+        raw_chars = raw_words = 0
+        clean_chars = clean_words = 0
+        raw_head = clean_head = ""
+        last_word = ""
+        carry = ""
+        
+        print("\nCleaning text...")
+        with open(self.file_path, 'r', encoding='utf-8') as file, tempfile.TemporaryFile() as cleaned_file:
+            for chunk in chain(iter(lambda: file.read(chunk_size), ''), [None]):
+                if chunk is None:
+                    # End of file: whatever is carried over is the last piece
+                    piece, carry = carry, ""
+                else:
+                    # Clean up to the last whitespace and carry the rest over,
+                    # so no word is split across two chunks
+                    chunk = carry + chunk
+                    cut = max(chunk.rfind(' '), chunk.rfind('\n')) + 1
+                    piece, carry = chunk[:cut], chunk[cut:]
+                
+                raw_chars += len(piece)
+                raw_words += len(piece.split())
+                if len(raw_head) < 100:
+                    raw_head += piece[:100 - len(raw_head)]
+                
+                cleaned = self.clean_text(piece)
+                # Runs of special tokens can straddle a chunk boundary
+                if last_word in ('<num>', '<eng>') and cleaned.startswith(last_word):
+                    if cleaned[len(last_word):len(last_word) + 1] in ('', ' '):
+                        cleaned = cleaned[len(last_word) + 1:]
+                if not cleaned:
+                    continue
+                
+                if clean_chars:
+                    cleaned = ' ' + cleaned
+                cleaned_file.write(cleaned.encode('utf-8'))
+                clean_chars += len(cleaned)
+                clean_words += cleaned.count(' ') + (clean_words == 0)
+                if len(clean_head) < 100:
+                    clean_head += cleaned[:100 - len(clean_head)]
+                last_word = cleaned[cleaned.rfind(' ') + 1:]
+            
+            # The memory map stays valid once the temporary file is closed;
+            # an empty file cannot be memory-mapped
+            cleaned_file.flush()
+            text = mmap.mmap(cleaned_file.fileno(), 0, access=mmap.ACCESS_READ) if clean_chars else b''
+        
+        # Statistics of the cleaned text that are still needed after training
+        self.clean_char_count = clean_chars - (clean_words - 1 if clean_words else 0)
         
         # Print initial text statistics
         print("\nDataset Statistics:")
-        print(f"Total characters: {len(text):,}")
-        print(f"Total words: {len(text.split()):,}")
+        print(f"Total characters: {raw_chars:,}")
+        print(f"Total words: {raw_words:,}")
         print("\nFirst 100 characters of raw text:")
         print("-" * 50)
-        print(text[:100])
+        print(raw_head)
         print("-" * 50)
         
-        # Text cleaning steps
-        print("\nCleaning text...")
-        # Replace numbers with special token
-        text = re.sub(r'[०-९0-9]+', ' <num> ', text)
-        # Replace English words with special token
-        text = re.sub(r'[A-Za-z]+', ' <eng> ', text)
-        # Remove punctuation
-        text = re.sub(r'[!@#$%^&*(),.?":{}|<>]', ' ', text)
-        # Remove Hindi purna viram and double purna viram
-        text = re.sub(r'[\u0964\u0965]', ' ', text)
-        # Keep only Hindi characters and special tokens
-        text = re.sub(r'[^\u0900-\u097F\s<>a-z]', '', text)
-        # Normalize spaces
-        text = re.sub(r'\s+', ' ', text)
-        # Merge consecutive special tokens
-        text = re.sub(r'<num>\s*<num>', '<num>', text)
-        text = re.sub(r'<eng>\s*<eng>', '<eng>', text)
-        
-        cleaned_text = text.strip()
-        
         # Print cleaned text statistics
         print("\nAfter cleaning:")
-        print(f"Total characters: {len(cleaned_text):,}")
-        print(f"Total words: {len(cleaned_text.split()):,}")
+        print(f"Total characters: {clean_chars:,}")
+        print(f"Total words: {clean_words:,}")
         print("\nFirst 100 characters of cleaned text:")
         print("-" * 50)
-        print(cleaned_text[:100])
+        print(clean_head)
         print("-" * 50)
         
-        return cleaned_text
+        return text
+    
+    def clean_text(self, text: str) -> str:
+        """Apply the cleaning steps of load_and_clean_text to a piece of text"""
+        # Remove punctuation, purna viram and double purna viram
+        text = _RE_PUNCT.sub(' ', text)
+        # Keep only Hindi characters, English letters and digits
+        text = _RE_NON_HINDI.sub('', text)
+        # Replace each run of English words with one special token (before
+        # numbers, so the letters of an inserted <num> are never mistaken
+        # for English)
+        text = _RE_ENG.sub(' <eng> ', text)
+        # Replace each run of numbers with one special token
+        text = _RE_NUM.sub(' <num> ', text)
+        # Normalize spaces
+        text = _RE_SPACE.sub(' ', text)
+        return text.strip()
     
-    def add_token(self, token: str):
-        """Add a new token to vocabulary with a unique ID"""
+    def add_token(self, token: bytes):
+        """Add a new token (as UTF-8 bytes) to vocabulary with a unique ID"""
         if token not in self.token_to_id:
             self.token_to_id[token] = self.next_id
             self.id_to_token[self.next_id] = token
@@ -121,170 +188,319 @@ class HindiTokenizer:
         # Add special tokens first to ensure consistent IDs
         print("Special tokens:")
         for token in self.special_tokens:
-            self.add_token(token)
+            self.add_token(token.encode('utf-8'))
             print(f"  {token}")
         
-        # Add each unique character from text
-        unique_chars = sorted(set(char for char in self.text if char.strip()))
+        # Add each unique character from text (all of which occur in some word);
+        # set() over one joined string collects them in C, not per character
+        unique_chars = set(b' '.join(self.word_freq).decode('utf-8'))
+        unique_chars.discard(' ')
+        unique_chars = sorted(unique_chars)
         print("\nUnique characters:")
         for char in unique_chars:
-            self.add_token(char)
+            self.add_token(char.encode('utf-8'))
             print(f"  '{char}' ({ord(char)})")
         
         print(f"\nInitial vocabulary size: {len(self.vocab)}")
         print("- Special tokens:", len(self.special_tokens))
         print("- Unique characters:", len(unique_chars))
     
-    def convert_to_utf8(self) -> List[List[int]]:
+    def convert_to_utf8(self) -> Dict[bytes, int]:
         """
         Convert text tokens to UTF-8 encodings.
-        Returns a list of lists, where each inner list contains
-        the UTF-8 codes for a token.
+        Returns a dictionary mapping the UTF-8 bytes of each unique
+        token to the number of times it occurs in the text.
         """
-        tokens = self.text.split()
-        encoded_tokens = []
-        for token in tokens:
-            # Convert each character to its UTF-8 encoding
-            encoded_token = []
-            for char in token:
-                encoded_token.extend(char.encode('utf-8'))
-            encoded_tokens.append(encoded_token)
-        return encoded_tokens
-    
-    def get_pairs(self) -> Counter:
-        """
-        Find all adjacent pairs of UTF-8 codes and count their frequencies.
-        Used to identify the most common pairs for merging.
-        """
-        pairs = Counter()
-        
-        for encoded_token in self.encoded_tokens:
-            if len(encoded_token) < 2:
-                continue
-            
-            # Count frequencies of adjacent pairs
-            for i in range(len(encoded_token)-1):
-                pair = (encoded_token[i], encoded_token[i+1])
-                pairs[pair] += 1
-        
-        return pairs
-    
-    def merge_pair(self, pair: Tuple[int, int], merged_token: Tuple[int, int], token_id: int) -> bool:
-        """
-        Replace all occurrences of a UTF-8 code pair with a new token ID.
-        Returns True if any merges were performed.
-        """
-        any_changes = False
-        new_encoded_tokens = []
-        
-        for encoded_token in self.encoded_tokens:
-            new_token = []
-            i = 0
-            while i < len(encoded_token):
-                # Check if current position has the target pair
-                if (i < len(encoded_token)-1 and 
-                    encoded_token[i] == pair[0] and 
-                    encoded_token[i+1] == pair[1]):
-                    new_token.append(token_id)
-                    i += 2
-                    any_changes = True
-                else:
-                    new_token.append(encoded_token[i])
-                    i += 1
-            new_encoded_tokens.append(new_token)
-        
-        if any_changes:
-            self.encoded_tokens = new_encoded_tokens
-            return True
-        return False
+        # The cleaned text is already UTF-8; count its words a chunk at a time
+        # straight off the memory map, carrying any word cut at a chunk edge
+        chunk_size = 1024 * 1024
+        word_freq = Counter()
+        carry = b''
+        for start in range(0, len(self.text), chunk_size):
+            chunk = carry + self.text[start:start + chunk_size]
+            cut = chunk.rfind(b' ') + 1
+            word_freq.update(chunk[:cut].split())
+            carry = chunk[cut:]
+        word_freq.update(carry.split())
+        return dict(word_freq)
     
     def build_vocabulary(self):
         """
-        Build vocabulary using BPE algorithm on UTF-8 encodings
+        Build vocabulary using BPE algorithm on UTF-8 encodings.
+
+        Unique words are laid out as a doubly-linked list of symbol nodes,
+        together with an index of where every adjacent pair occurs and a
+        max-heap of pair frequencies weighted by word counts. Each merge only
+        touches the neighbours of the merged positions; outdated heap entries
+        are skipped when popped.
         """
         # First print initial token stats
-        self.initial_tokens_length = sum(len(t) for t in self.encoded_tokens)
+        self.initial_tokens_length = sum(len(w) * c for w, c in self.word_freq.items())
         print(f"\nInitial statistics:")
         print(f"- Total tokens: {self.initial_tokens_length:,}")
         print(f"- Vocabulary size: {self.initial_vocab_size:,}")
         
         print("\nStarting BPE algorithm on UTF-8 encodings...")
         
+        # Training symbols are byte values 0-255 followed by one new symbol
+        # per merge; symbol_bytes maps each symbol to the bytes it stands for
+        self.symbol_bytes = [bytes([i]) for i in range(256)]
+        self.merges = []
+        self.build_symbol_list()
+        
+        # Max-heap of (-frequency, pair key). Every live pair has an entry at
+        # or above its current frequency: increases push a new entry, while
+        # decreases leave the old one to be corrected when it is popped
+        heap = [(-freq, key) for key, freq in self.pair_counts.items()]
+        heapq.heapify(heap)
+        
+        self.total_tokens = self.initial_tokens_length
         iteration = 0
-        while len(self.vocab) < self.vocab_size:
-            # Count current tokens for progress tracking
-            tokens_before = sum(len(t) for t in self.encoded_tokens)
+        while len(self.vocab) < self.vocab_size and heap:
+            neg_freq, key = heapq.heappop(heap)
+            # Re-queue entries whose frequency has since dropped
+            current_freq = self.pair_counts.get(key)
+            if current_freq != -neg_freq:
+                if current_freq:
+                    heapq.heappush(heap, (-current_freq, key))
+                continue
             
-            # Find most common pair
-            pairs = self.get_pairs()
-            if not pairs:
-                break
+            freq = -neg_freq
+            pair = (key >> 32, key & 0xFFFFFFFF)
+            new_symbol = len(self.symbol_bytes)
+            merged_bytes = self.symbol_bytes[pair[0]] + self.symbol_bytes[pair[1]]
+            # Decoding an example word is only for display, so do it sparingly
+            if self.verbose or iteration % 100 == 0:
+                example = next(iter(self.pair_positions[key]))
+                merged_chars = f" ({self.describe_pair(pair, example)})"
+            else:
+                merged_chars = ""
             
-            most_common = pairs.most_common(1)[0]
-            pair = most_common[0]
-            freq = most_common[1]
-            new_id = len(self.vocab) + self.initial_vocab_size
+            # Merge pair and queue every pair whose frequency grew
+            tokens_before = self.total_tokens
+            merges_done, grown = self.merge_positions(key, new_symbol)
+            for grown_key in grown:
+                # A pair can grow and then vanish within the same merge; .get
+                # avoids re-creating it in the defaultdict with a zero count
+                grown_freq = self.pair_counts.get(grown_key)
+                if grown_freq:
+                    heapq.heappush(heap, (-grown_freq, grown_key))
             
-            # Convert the entire sequence containing the pair to show actual text
-            try:
-                # Find a token containing this pair
-                example_token = None
-                for token in self.encoded_tokens:
-                    for i in range(len(token)-1):
-                        if token[i] == pair[0] and token[i+1] == pair[1]:
-                            example_token = token
-                            break
-                    if example_token:
-                        break
-                
-                if example_token:
-                    # Convert the full token to show context
-                    full_text = bytes(example_token).decode('utf-8')
-                    # Find the subword being merged
-                    for i in range(len(example_token)-1):
-                        if example_token[i] == pair[0] and example_token[i+1] == pair[1]:
-                            subword = bytes(example_token[i:i+2]).decode('utf-8', errors='ignore')
-                            merged_chars = f"'{subword}' in '{full_text}'"
-                            break
-                else:
-                    merged_chars = "<?>"
-            except:
-                merged_chars = "<?>"
+            # Rebuild the heap from live counts once outdated entries dominate it
+            if len(heap) > 2 * len(self.pair_counts):
+                heap = [(-freq, key) for key, freq in self.pair_counts.items()]
+                heapq.heapify(heap)
             
-            # Merge pair if possible
-            if self.merge_pair(pair, pair, new_id):
-                self.vocab.add(new_id)
-                tokens_after = sum(len(t) for t in self.encoded_tokens)
+            if merges_done:
+                self.symbol_bytes.append(merged_bytes)
+                self.merges.append((pair, new_symbol))
+                # A merge can rebuild an existing token (e.g. a full character)
+                self.add_token(merged_bytes)
+                self.total_tokens -= merges_done
                 print(f"Iteration {iteration:,} | "
-                      f"Merged {pair} ({merged_chars}) | "
+                      f"Merged {pair}{merged_chars} | "
                       f"Frequency: {freq:,} | "
-                      f"New ID: {new_id:,} | "
-                      f"Tokens: {tokens_before:,} → {tokens_after:,} | "
-                      f"Vocab Size: {len(self.vocab) + self.initial_vocab_size:,}")
+                      f"New ID: {self.token_to_id[merged_bytes]:,} | "
+                      f"Tokens: {tokens_before:,} → {self.total_tokens:,} | "
+                      f"Vocab Size: {len(self.vocab):,}")
             
             iteration += 1
+        
+        # Release the training-only structures, the largest of the run; only
+        # symbol_bytes, merges and the vocabulary are needed from here on
+        del self.word_freq, self.vals, self.prev, self.next, self.weights, self.heads
+        del self.pair_positions, self.pair_counts
+        
+        self.build_trie()
+    
+    def build_symbol_list(self):
+        """
+        Lay out the unique words of word_freq as a doubly-linked list of
+        symbol nodes. Node attributes are kept in parallel typed arrays
+        indexed by node id (val, prev, next, weight) rather than lists of
+        boxed ints; -1 marks a token boundary (and, as a val, a node merged
+        away) and weight is the count of the word the node belongs to.
+        heads holds the first node of every word. Also indexes
+        every adjacent pair by the node ids where it starts, and counts each
+        pair weighted by word count. Pairs (a, b) are keyed by the single
+        int (a << 32) | b, which hashes and compares faster than a tuple.
+        """
+        # Build the node lists in bulk: link every node to its neighbours,
+        # then cut the links at word boundaries
+        words = list(self.word_freq)
+        lengths = [len(word) for word in words]
+        self.vals = array('i', chain.from_iterable(words))
+        self.weights = array('q', chain.from_iterable(map(repeat, self.word_freq.values(), lengths)))
+        self.prev = array('i', range(-1, len(self.vals) - 1))
+        self.next = array('i', range(1, len(self.vals) + 1))
+        self.heads = array('i', accumulate([0] + lengths))[:-1]
+        for head, length in zip(self.heads, lengths):
+            self.prev[head] = -1
+            self.next[head + length - 1] = -1
+        
+        # defaultdict(int) fills in missing pairs in C, whereas Counter calls
+        # its Python-level __missing__ for every pair seen for the first time
+        pair_positions = self.pair_positions = defaultdict(set)
+        pair_counts = self.pair_counts = defaultdict(int)
+        nodes = zip(self.vals, islice(self.vals, 1, None), self.next, self.weights)
+        for i, (first, second, nxt, weight) in enumerate(nodes):
+            if nxt != -1:
+                key = first << 32 | second
+                pair_positions[key].add(i)
+                pair_counts[key] += weight
+    
+    def read_symbols(self, node: int) -> List[int]:
+        """Collect symbol values from node to the end of its token"""
+        symbols = []
+        while node != -1:
+            symbols.append(self.vals[node])
+            node = self.next[node]
+        return symbols
+    
+    def describe_pair(self, pair: Tuple[int, int], node: int) -> str:
+        """
+        Decode the token containing the pair starting at node, to show
+        the actual text being merged in progress output.
+        """
+        head = node
+        while self.prev[head] != -1:
+            head = self.prev[head]
+        full_text = b''.join(self.symbol_bytes[v] for v in self.read_symbols(head))
+        subword = self.symbol_bytes[pair[0]] + self.symbol_bytes[pair[1]]
+        return (f"'{subword.decode('utf-8', errors='ignore')}' in "
+                f"'{full_text.decode('utf-8', errors='replace')}'")
+    
+    def merge_positions(self, key: int, token_id: int) -> Tuple[int, set]:
+        """
+        Replace every indexed occurrence of a pair (given by its packed
+        key) with a new symbol ID by splicing the linked list, updating
+        only the neighbouring pairs. Returns the number of merges performed
+        (weighted by word count) and the set of pair keys whose frequency
+        grew.
+        """
+        # Bind everything to locals: this loop runs once per merged occurrence
+        vals, prev, nxt = self.vals, self.prev, self.next
+        weights = self.weights
+        pair_positions, pair_counts = self.pair_positions, self.pair_counts
+        get_positions = pair_positions.get
+        grown = set()
+        
+        a, b = key >> 32, key & 0xFFFFFFFF
+        merges_done = 0
+        del pair_counts[key]
+        occurrences = pair_positions.pop(key)
+        # Only a pair like (a, a) can overlap itself ('aaa'); merge those left
+        # to right like a scan would, skipping occurrences an earlier merge
+        # consumed. Otherwise the index is exact and order is irrelevant, so
+        # walk the set as is, without sorting or re-checking each occurrence
+        overlapping = a == b
+        if overlapping:
+            occurrences = sorted(occurrences)
+        for w1 in occurrences:
+            w2 = nxt[w1]
+            if overlapping and (vals[w1] != a or w2 == -1 or vals[w2] != b):
+                continue
+            before, after = prev[w1], nxt[w2]
+            weight = weights[w1]
+            
+            # Unlink the pairs around the occurrence
+            if before != -1:
+                left = vals[before] << 32 | a
+                positions = get_positions(left)
+                if positions is not None and before in positions:
+                    positions.remove(before)
+                    if positions:
+                        pair_counts[left] -= weight
+                    else:
+                        del pair_positions[left]
+                        del pair_counts[left]
+            if after != -1:
+                right = b << 32 | vals[after]
+                positions = get_positions(right)
+                if positions is not None and w2 in positions:
+                    positions.remove(w2)
+                    if positions:
+                        pair_counts[right] -= weight
+                    else:
+                        del pair_positions[right]
+                        del pair_counts[right]
+            
+            # Splice w2 out and store the merged token in w1
+            vals[w1] = token_id
+            vals[w2] = -1
+            nxt[w1] = after
+            if after != -1:
+                prev[after] = w1
+            
+            # Link the new neighbouring pairs
+            if before != -1:
+                left = vals[before] << 32 | token_id
+                pair_positions[left].add(before)
+                pair_counts[left] += weight
+                grown.add(left)
+            if after != -1:
+                right = token_id << 32 | vals[after]
+                pair_positions[right].add(w1)
+                pair_counts[right] += weight
+                grown.add(right)
+            merges_done += weight
+        
+        return merges_done, grown
+    
+    def build_trie(self):
+        """
+        Build a byte trie over the vocabulary for longest-match
+        tokenization. Each node is a dict of next byte -> child node;
+        nodes ending a token store its ID under '__id__'.
+        Tokens that split a character are only intermediate merge steps
+        and are left out, so every match ends on a character boundary.
+        """
+        self.trie = {}
+        for token in self.vocab:
+            try:
+                token.decode('utf-8')
+            except UnicodeDecodeError:
+                continue
+            node = self.trie
+            for byte in token:
+                node = node.setdefault(byte, {})
+            node['__id__'] = self.token_to_id[token]
     
     def tokenize(self, text: str) -> List[int]:
         """Tokenize input text using the built vocabulary"""
+        text = text.encode('utf-8')
+        text_length = len(text)
+        trie = self.trie
+        unk_id = self.token_to_id[b'<unk>']
         tokens = []
         current_pos = 0
         
-        while current_pos < len(text):
-            longest_token = None
-            longest_length = 0
+        while current_pos < text_length:
+            longest_id = None
+            longest_end = current_pos
             
-            # Find the longest matching token
-            for token in self.vocab:
-                if text[current_pos:].startswith(token) and len(token) > longest_length:
-                    longest_token = token
-                    longest_length = len(token)
+            # Walk the trie to find the longest matching token
+            node = trie
+            pos = current_pos
+            while pos < text_length:
+                node = node.get(text[pos])
+                if node is None:
+                    break
+                pos += 1
+                token_id = node.get('__id__')
+                if token_id is not None:
+                    longest_id = token_id
+                    longest_end = pos
             
-            if longest_token:
-                tokens.append(self.token_to_id[longest_token])
-                current_pos += longest_length
+            if longest_id is not None:
+                tokens.append(longest_id)
+                current_pos = longest_end
             else:
-                tokens.append(self.token_to_id['<unk>'])
+                tokens.append(unk_id)
+                # Skip the whole unknown character, not just its lead byte
                 current_pos += 1
+                while current_pos < text_length and 0x80 <= text[current_pos] < 0xC0:
+                    current_pos += 1
         
         return tokens
     
@@ -292,28 +508,10 @@ class HindiTokenizer:
         return [ord(char) for char in text]
     
     def get_compression_ratio(self) -> float:
-        original_length = len(''.join(self.text.split()))
+        original_length = self.clean_char_count
         compressed_length = len(self.vocab)
         return original_length / compressed_length if compressed_length > 0 else 0.0 
     
-    def count_real_tokens(self, text: str) -> int:
-        """Count actual tokens in text, including merged tokens (_X_)"""
-        tokens = []
-        i = 0
-        while i < len(text):
-            if text[i] == '_':
-                # Handle merged token
-                end = text.find('_', i + 1)
-                if end != -1:
-                    tokens.append(text[i:end+1])
-                    i = end + 1
-                    continue
-            # Handle regular character
-            if text[i] != ' ':
-                tokens.append(text[i])
-            i += 1
-        return len(tokens)
-    
     def get_stats(self):
         """
         Get tokenization statistics including:
@@ -323,11 +521,11 @@ class HindiTokenizer:
         - Final vocab: Size of vocabulary after BPE
         - Compression ratio: Initial tokens / Final tokens
         """
-        final_tokens = sum(len(t) for t in self.encoded_tokens)
+        final_tokens = self.total_tokens
         return {
             "initial_tokens": self.initial_tokens_length,  # Original character count
             "initial_vocab": self.initial_vocab_size,      # Original vocab size
             "final_tokens": final_tokens,                  # Tokens after BPE
-            "final_vocab": len(self.vocab) + self.initial_vocab_size,  # Final vocab size
+            "final_vocab": len(self.vocab),                # Final vocab size
             "compression_ratio": self.initial_tokens_length / final_tokens if final_tokens > 0 else 0
         } 
\ No newline at end of file